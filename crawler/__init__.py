@@ -1,19 +1,29 @@
+import time
+
 from utils import get_logger
 from crawler.frontier import Frontier
 from crawler.worker import Worker
+from crawler.concurrency import ConcurrencyController
 
 class Crawler(object):
     def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
         self.config = config
         self.logger = get_logger("CRAWLER")
+        # Shared through the config, like the cache server, so every
+        # download (including robots.txt and sitemaps) goes through it.
+        self.config.concurrency = ConcurrencyController(config, self.logger)
         self.frontier = frontier_factory(config, restart)
         self.workers = list()
         self.worker_factory = worker_factory
 
     def start_async(self):
+        start = time.perf_counter()
         self.workers = [
             self.worker_factory(worker_id, self.config, self.frontier)
-            for worker_id in range(self.config.threads_count)]
+            for worker_id in range(self.config.max_threads_count)]
+        self.logger.info(
+            f"Created {len(self.workers)} workers in "
+            f"{(time.perf_counter() - start) * 1000:.1f} ms.")
         for worker in self.workers:
             worker.start()
 
@@ -24,3 +34,6 @@ class Crawler(object):
     def join(self):
         for worker in self.workers:
             worker.join()
+
+    def close(self):
+        self.frontier.close()
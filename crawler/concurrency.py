@@ -0,0 +1,98 @@
+import time
+
+from threading import Condition
+
+from utils.download import download
+
+# Weight of the newest sample in the latency and error rate averages.
+EWMA_WEIGHT = 0.1
+# Overload rate above which the cache server is backed off from, takes
+# about three overloaded responses in a row from a clean start.
+MAX_ERROR_RATE = 0.25
+# Fewest downloads between two decreases of the limit.
+MIN_SAMPLES = 3
+# Multiplicative decrease factor.
+BACKOFF = 0.5
+# Statuses the cache server itself answers with when it is overloaded:
+# gateway errors in front of it and 602 (spacetime server failure). Origin
+# 5xx pages and url specific 6xx codes say nothing about its capacity.
+OVERLOAD_STATUSES = {502, 503, 504, 602}
+
+
+def is_overload(resp):
+    ''' Whether a download outcome means the cache server is overloaded. '''
+    if resp is None:
+        # The request itself failed (connection error or timeout).
+        return True
+    # Origin responses carry no error, only the cache server sets it.
+    return resp.error is not None and resp.status in OVERLOAD_STATUSES
+
+
+class ConcurrencyController(object):
+    '''
+    AIMD limit on how many downloads run at once.
+
+    Every download reports its latency and whether the cache server was
+    overloaded. While the average latency stays under config.target_latency
+    and few downloads hit overload, the limit grows by about one slot per
+    limit's worth of downloads. When either goes over, the limit is halved,
+    at most once per window of max(limit, MIN_SAMPLES) downloads so one
+    slow burst is not punished several times.
+    '''
+    def __init__(self, config, logger):
+        self.config = config
+        self.logger = logger
+        self.min_limit = config.min_threads_count
+        self.max_limit = config.max_threads_count
+        self.target_latency = config.target_latency
+        self.limit = float(min(max(config.threads_count, self.min_limit), self.max_limit))
+        self.active = 0
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.condition = Condition()
+
+    def acquire(self):
+        ''' Block until a download slot is free. '''
+        with self.condition:
+            while self.active >= int(self.limit):
+                self.condition.wait()
+            self.active += 1
+
+    def release(self, latency, overloaded):
+        ''' Free a download slot and adjust the limit from its outcome. '''
+        with self.condition:
+            self.active -= 1
+            self.samples += 1
+            self.latency = (
+                latency if self.latency is None else
+                EWMA_WEIGHT * latency + (1 - EWMA_WEIGHT) * self.latency)
+            self.error_rate = (
+                EWMA_WEIGHT * (1 if overloaded else 0)
+                + (1 - EWMA_WEIGHT) * self.error_rate)
+
+            old_limit = int(self.limit)
+            if self.latency > self.target_latency or self.error_rate > MAX_ERROR_RATE:
+                if self.samples >= max(old_limit, MIN_SAMPLES):
+                    self.limit = max(self.min_limit, self.limit * BACKOFF)
+                    self.samples = 0
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+
+            if int(self.limit) != old_limit:
+                self.logger.info(
+                    f"Concurrency limit {old_limit} -> {int(self.limit)} "
+                    f"(latency {self.latency:.2f}s, "
+                    f"overload rate {self.error_rate:.2f}).")
+            self.condition.notify_all()
+
+    def fetch(self, url, logger):
+        ''' download() inside a slot, reporting its outcome. '''
+        self.acquire()
+        start = time.time()
+        resp = None
+        try:
+            resp = download(url, self.config, logger)
+            return resp
+        finally:
+            self.release(time.time() - start, is_overload(resp))
@@ -0,0 +1,169 @@
+import os
+import mmap
+import struct
+
+from threading import RLock
+
+from utils import get_logger
+from .sim import SKETCH_SIZE, sketch_similarity
+
+# exact hashes are a raw 20 byte SHA-1 digest followed by the 32 byte
+# urlhash of the page it came from
+HASH_RECORD = struct.Struct("20s32s")
+# near-duplicate sketches are the page urlhash, a hash count and
+# SKETCH_SIZE hashes, unused slots are zero
+SKETCH_RECORD = struct.Struct(f"<32sI{SKETCH_SIZE}Q")
+# Records appended between two remaps of the file.
+REMAP_EVERY = 1024
+
+
+class _AppendOnlyFile(object):
+    '''
+    Fixed size records appended to a file and read back through mmap. New
+    records are kept in memory and the file is only remapped once every
+    REMAP_EVERY appends.
+    '''
+    def __init__(self, path, record):
+        self.path = path
+        self.record = record
+        self.file = open(path, "ab+")
+        # Drop a partially written trailing record left by a crash.
+        size = os.path.getsize(path)
+        if size % record.size:
+            self.file.truncate(size - size % record.size)
+        self.map = None
+        self.mapped_count = 0
+        self.pending = list()
+        self._remap()
+
+    def _remap(self):
+        size = os.path.getsize(self.path)
+        # The old map is not closed here, a snapshot being read may still
+        # use it, it is released once nothing refers to it.
+        self.map = (
+            mmap.mmap(self.file.fileno(), size, access=mmap.ACCESS_READ)
+            if size else None)
+        self.mapped_count = size // self.record.size
+        self.pending = list()
+
+    def __len__(self):
+        return self.mapped_count + len(self.pending)
+
+    def __iter__(self):
+        return self.snapshot()()
+
+    def snapshot(self, start=0):
+        '''
+        Returns a generator function over the records from start to the
+        current end. Take it under the owner's lock, it can then be
+        iterated without the lock while more records are appended.
+        '''
+        mapped, mapped_count, pending = self.map, self.mapped_count, list(self.pending)
+
+        def records():
+            for i in range(start, mapped_count):
+                yield self.record.unpack_from(mapped, i * self.record.size)
+            yield from pending[max(0, start - mapped_count):]
+        return records
+
+    def append(self, *values):
+        self.file.write(self.record.pack(*values))
+        self.file.flush()
+        self.pending.append(values)
+        if len(self.pending) >= REMAP_EVERY:
+            self._remap()
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.file.close()
+
+
+class FingerprintStore(object):
+    '''
+    Exact hashes and near-duplicate sketches of every page seen so far,
+    kept next to the frontier save file so they survive a resume. Every
+    fingerprint carries the urlhash of its page, so a page refetched after
+    a crash is not mistaken for a duplicate of itself.
+    '''
+    def __init__(self, save_file, reset):
+        self.logger = get_logger("FINGERPRINTS", "FRONTIER")
+        self.lock = RLock()
+        hashes_file = f"{save_file}.hashes"
+        sketches_file = f"{save_file}.sketches"
+        if reset:
+            for path in (hashes_file, sketches_file):
+                if os.path.exists(path):
+                    self.logger.info(f"Found fingerprint file {path}, deleting it.")
+                    os.remove(path)
+        self.hashes_file = _AppendOnlyFile(hashes_file, HASH_RECORD)
+        self.sketches_file = _AppendOnlyFile(sketches_file, SKETCH_RECORD)
+        # Membership checks need a dict of digest -> urlhash, so each record
+        # is unpacked from the mapping once here (52 bytes per page).
+        self.hashes = dict(self.hashes_file)
+        self.logger.info(
+            f"Loaded {len(self.hashes)} page hashes and "
+            f"{len(self.sketches_file)} near-duplicate sketches.")
+
+    def add_hash(self, digest, urlhash):
+        '''
+        Record an exact page hash, returns the urlhash of the page it
+        duplicates or None.
+        '''
+        with self.lock:
+            other_urlhash = self.hashes.get(digest)
+            if other_urlhash is not None:
+                return other_urlhash if other_urlhash != urlhash else None
+            self.hashes[digest] = urlhash
+            self.hashes_file.append(digest, urlhash)
+            return None
+
+    def add_sketch(self, page_sketch, urlhash, threshold):
+        '''
+        Record a page sketch unless a stored one is at least threshold
+        similar, returns (similarity, urlhash) of the match or None. The
+        stored sketches are scanned without the lock, only the few added
+        during the scan are checked again under it before appending.
+        '''
+        with self.lock:
+            scanned = len(self.sketches_file)
+            records = self.sketches_file.snapshot()
+        match, stored = self._scan(records(), page_sketch, urlhash, threshold)
+        if match is not None:
+            return match
+        with self.lock:
+            new_match, new_stored = self._scan(
+                self.sketches_file.snapshot(scanned)(), page_sketch, urlhash, threshold)
+            if new_match is not None:
+                return new_match
+            if not (stored or new_stored):
+                padding = [0] * (SKETCH_SIZE - len(page_sketch))
+                self.sketches_file.append(
+                    urlhash, len(page_sketch), *page_sketch, *padding)
+            return None
+
+    @staticmethod
+    def _scan(records, page_sketch, urlhash, threshold):
+        ''' Returns (match or None, whether urlhash's own sketch was seen). '''
+        stored = False
+        page_set = set(page_sketch)
+        for record in records:
+            if record[0] == urlhash:
+                stored = True
+                continue
+            count = record[1]
+            other_sketch = record[2:count + 2]
+            # The estimate can't be above the sketches' overlap over the
+            # larger of them, so most pages are ruled out by a set
+            # intersection before the slower walk.
+            if len(page_set.intersection(other_sketch)) < threshold * max(len(page_sketch), count):
+                continue
+            sim = sketch_similarity(page_sketch, other_sketch)
+            if sim >= threshold:
+                return (sim, record[0]), stored
+        return None, stored
+
+    def close(self):
+        with self.lock:
+            self.hashes_file.close()
+            self.sketches_file.close()
@@ -1,17 +1,38 @@
 import os
+import heapq
 import shelve
+import time
 
-from threading import Thread, RLock
+from threading import Thread, RLock, Condition
 from queue import Queue, Empty
+from urllib.parse import urlparse
 
 from utils import get_logger, get_urlhash, normalize
 from scraper import is_valid
+from crawler.fingerprints import FingerprintStore
+from crawler.robots import RobotsCache
+from crawler.sitemaps import SitemapReader
 
 class Frontier(object):
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
         self.to_be_downloaded = list()
+        self.robots = RobotsCache(config, self.logger)
+        # Hosts already handed to the sitemap reader this run.
+        self.sitemap_hosts = set()
+        # netloc -> earliest time the next fetch from that host may start.
+        self.host_next_fetch = dict()
+        self.host_lock = RLock()
+        # Guards the save file and the to be downloaded list across workers.
+        self.lock = RLock()
+        # Urls handed to workers and hosts queued for the sitemap reader that
+        # are not finished yet, they may still add urls.
+        self.in_flight = 0
+        self.has_work = Condition(self.lock)
+        # (time, url) heap of urls put back until their host's robots.txt
+        # can be fetched again.
+        self.delayed = list()
         
         if not os.path.exists(self.config.save_file) and not restart:
             # Save file does not exist, but request to load save.
@@ -25,6 +46,11 @@ class Frontier(object):
             os.remove(self.config.save_file)
         # Load existing save file, or create one if it does not exist.
         self.save = shelve.open(self.config.save_file)
+        # Dedup fingerprints and read sitemaps are checkpointed next to the
+        # save file, and start over whenever the frontier starts from seed.
+        from_seed = restart or not self.save
+        self.fingerprints = FingerprintStore(self.config.save_file, from_seed)
+        self.sitemap_reader = SitemapReader(self, from_seed)
         if restart:
             for url in self.config.seed_urls:
                 self.add_url(url)
@@ -34,6 +60,7 @@ class Frontier(object):
             if not self.save:
                 for url in self.config.seed_urls:
                     self.add_url(url)
+        self.sitemap_reader.start()
 
     def _parse_save_file(self):
         ''' This function can be overridden for alternate saving techniques. '''
@@ -47,26 +74,96 @@ class Frontier(object):
             f"Found {tbd_count} urls to be downloaded from {total_count} "
             f"total urls discovered.")
 
+    def get_url(self, urlhash):
+        ''' Url saved under urlhash, or None if it was never added. '''
+        with self.lock:
+            entry = self.save.get(urlhash)
+            return entry[0] if entry else None
+
     def get_tbd_url(self):
-        try:
-            return self.to_be_downloaded.pop()
-        except IndexError:
-            return None
+        '''
+        Waits while the list is empty but other work is in flight or urls
+        are delayed, returns None once everything is done. Call finish_url
+        for every url returned.
+        '''
+        with self.has_work:
+            while True:
+                now = time.time()
+                while self.delayed and self.delayed[0][0] <= now:
+                    self.to_be_downloaded.append(heapq.heappop(self.delayed)[1])
+                if self.to_be_downloaded:
+                    self.in_flight += 1
+                    return self.to_be_downloaded.pop()
+                if not self.in_flight and not self.delayed:
+                    return None
+                self.has_work.wait(
+                    self.delayed[0][0] - now if self.delayed else None)
+
+    def retry_url(self, url, retry_at):
+        ''' Put url back to be downloaded again after retry_at. '''
+        with self.has_work:
+            heapq.heappush(self.delayed, (retry_at, url))
+            self.has_work.notify_all()
+
+    def finish_url(self):
+        ''' Mark one url or sitemap host from the frontier as done. '''
+        with self.has_work:
+            self.in_flight -= 1
+            self.has_work.notify_all()
 
     def add_url(self, url):
+        ''' Returns True if url was new and added to be downloaded. '''
+        with self.lock:
+            return self._add_url(url)
+
+    def _add_url(self, url):
         url = normalize(url)
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            self.save[urlhash] = (url, False)
-            self.save.sync()
-            self.to_be_downloaded.append(url)
+        if urlhash in self.save:
+            return False
+        # Only robots.txt files already cached are checked here so no
+        # download happens under the lock, workers check the rest.
+        if not self.robots.can_fetch(url, fetch=False):
+            self.logger.info(f"Disallowed by robots.txt: {url}")
+            return False
+        self.save[urlhash] = (url, False)
+        self.save.sync()
+        self.to_be_downloaded.append(url)
+        self.has_work.notify()
+        netloc = urlparse(url).netloc
+        if netloc not in self.sitemap_hosts:
+            self.sitemap_hosts.add(netloc)
+            self.in_flight += 1
+            self.sitemap_reader.add_host(url)
+        return True
+
+    def wait_for_host(self, url):
+        '''
+        Block until url's host may be fetched again, so concurrent workers
+        keep at least POLITENESS (or the robots.txt Crawl-delay) between
+        downloads from the same host.
+        '''
+        delay = max(self.config.time_delay, self.robots.crawl_delay(url))
+        netloc = urlparse(url).netloc
+        with self.host_lock:
+            now = time.time()
+            start = max(now, self.host_next_fetch.get(netloc, now))
+            self.host_next_fetch[netloc] = start + delay
+        if start > now:
+            time.sleep(start - now)
     
     def mark_url_complete(self, url):
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            # This should not happen.
-            self.logger.error(
-                f"Completed url {url}, but have not seen it before.")
+        with self.lock:
+            if urlhash not in self.save:
+                # This should not happen.
+                self.logger.error(
+                    f"Completed url {url}, but have not seen it before.")
 
-        self.save[urlhash] = (url, True)
-        self.save.sync()
+            self.save[urlhash] = (url, True)
+            self.save.sync()
+
+    def close(self):
+        ''' Close the files kept next to the save file. '''
+        self.fingerprints.close()
+        self.sitemap_reader.close()
@@ -0,0 +1,114 @@
+import time
+
+from threading import Lock
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+# Seconds before retrying a robots.txt that failed with a server or cache
+# error. Urls on the host wait until then instead of being crawled.
+ROBOTS_RETRY_TTL = 300
+
+
+class RobotsCache(object):
+    '''
+    Parsed robots.txt per host, fetched through the cache server and kept
+    for config.robots_ttl seconds.
+    '''
+    def __init__(self, config, logger):
+        self.config = config
+        self.logger = logger
+        # Guards the two dicts below, never held while downloading.
+        self.lock = Lock()
+        # netloc -> (RobotFileParser, time it expires), the parser is None
+        # while robots.txt is unavailable
+        self.parsers = dict()
+        # netloc -> Lock, so one host's fetch doesn't block the others.
+        self.host_locks = dict()
+
+    def _fetch(self, scheme, netloc):
+        robots_url = f"{scheme}://{netloc}/robots.txt"
+        parser = RobotFileParser(robots_url)
+        try:
+            resp = self.config.concurrency.fetch(robots_url, self.logger)
+        except Exception as e:
+            self.logger.error(f"Failed downloading {robots_url}: {e}")
+            resp = None
+        ttl = self.config.robots_ttl
+        if resp is not None and resp.status == 200 and resp.raw_response is not None:
+            content = resp.raw_response.content.decode("utf-8", errors="ignore")
+            parser.parse(content.splitlines())
+        elif resp is not None and 400 <= resp.status < 500:
+            # Missing robots.txt means everything is allowed.
+            self.logger.info(
+                f"No robots.txt for {netloc} (status <{resp.status}>).")
+            parser.allow_all = True
+        else:
+            # Server or cache error, robots.txt is unknown until a retry.
+            self.logger.warning(
+                f"Could not fetch robots.txt for {netloc} "
+                f"(status <{resp.status if resp else None}>), "
+                f"retrying in {ROBOTS_RETRY_TTL}s.")
+            parser = None
+            ttl = ROBOTS_RETRY_TTL
+        if parser is not None:
+            parser.modified()
+        time.sleep(self.config.time_delay)
+        return parser, time.time() + ttl
+
+    def _entry(self, url, fetch=True):
+        '''
+        (parser, expires) for url's host. If it is not cached yet, fetch it,
+        or return None when fetch is False.
+        '''
+        parsed = urlparse(url)
+        netloc = parsed.netloc
+        with self.lock:
+            entry = self.parsers.get(netloc)
+            if entry is not None and time.time() < entry[1]:
+                return entry
+            if not fetch:
+                return None
+            host_lock = self.host_locks.setdefault(netloc, Lock())
+        with host_lock:
+            # Another thread may have fetched it while we waited.
+            with self.lock:
+                entry = self.parsers.get(netloc)
+            if entry is None or time.time() >= entry[1]:
+                entry = self._fetch(parsed.scheme, netloc)
+                with self.lock:
+                    self.parsers[netloc] = entry
+            return entry
+
+    def retry_at(self, url):
+        '''
+        When robots.txt for url's host could not be fetched, the time to try
+        again, otherwise None.
+        '''
+        parser, expires = self._entry(url)
+        return expires if parser is None else None
+
+    def can_fetch(self, url, fetch=True):
+        '''
+        False only when a robots.txt rule disallows url. An unavailable
+        robots.txt, or an uncached one with fetch False, counts as allowed,
+        so check retry_at before downloading.
+        '''
+        entry = self._entry(url, fetch)
+        if entry is None or entry[0] is None:
+            return True
+        return entry[0].can_fetch(self.config.user_agent, url)
+
+    def crawl_delay(self, url):
+        parser = self._entry(url)[0]
+        return (parser.crawl_delay(self.config.user_agent) if parser else None) or 0
+
+    def sitemaps(self, url):
+        ''' Sitemaps listed in robots.txt, or the default /sitemap.xml. '''
+        parser = self._entry(url)[0]
+        if parser is None:
+            return []
+        sitemaps = parser.site_maps()
+        if sitemaps:
+            return sitemaps
+        parsed = urlparse(url)
+        return [f"{parsed.scheme}://{parsed.netloc}/sitemap.xml"]
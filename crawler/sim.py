@@ -48,3 +48,39 @@ def similarity(set1, set2):
     return inter / union if union else 0
 
 
+
+# Compact near-duplicate fingerprint (bottom-k sketch)
+# Keep only the k smallest 64-bit hashes of a page's shingles. The Jaccard similarity of two
+# pages is estimated from the k smallest hashes of the union of their sketches, so we can
+# compare fixed-size fingerprints instead of full shingle sets and store them on disk
+# k = 256 keeps the standard error near 0.9 at about 0.02, with k = 64 pages at J = 0.85 were
+# flagged as near duplicates 15% of the time
+SKETCH_SIZE = 256
+
+def sketch(shingles_set, k=SKETCH_SIZE):
+    '''
+    Return the k smallest shingle hashes in sorted order (fewer if the page has fewer shingles)
+    blake2b is used instead of hash() because hash() changes between processes and the sketches
+    have to survive a resume
+    '''
+    hashes = {int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+              for s in shingles_set}
+    return sorted(hashes)[:k]
+
+def sketch_similarity(sketch1, sketch2, k=SKETCH_SIZE):
+    '''
+    estimate similarity by walking both sorted sketches together and counting how many of the
+    k smallest hashes of the union appear in both -> exact Jaccard when both pages have < k shingles
+    '''
+    i = j = taken = shared = 0
+    while taken < k and (i < len(sketch1) or j < len(sketch2)):
+        if j >= len(sketch2) or (i < len(sketch1) and sketch1[i] < sketch2[j]):
+            i += 1
+        elif i >= len(sketch1) or sketch2[j] < sketch1[i]:
+            j += 1
+        else:
+            shared += 1
+            i += 1
+            j += 1
+        taken += 1
+    return shared / taken if taken else 0
@@ -0,0 +1,120 @@
+import gzip
+import shelve
+import time
+
+from threading import Thread, Lock
+from queue import Queue
+from urllib.parse import urlparse
+from xml.etree import ElementTree
+
+from scraper import is_valid, is_valid_domain
+
+# How deep to follow sitemap index files.
+SITEMAP_MAX_DEPTH = 2
+
+
+def parse_sitemap(content):
+    '''
+    Returns (urls, nested sitemaps) listed in a sitemap or sitemap index.
+    Only the <loc> of each <url> or <sitemap> entry is read, not the image
+    or video locations some sitemaps add.
+    '''
+    if content[:2] == b"\x1f\x8b":
+        content = gzip.decompress(content)
+    root = ElementTree.fromstring(content)
+    # Sitemaps should use the sitemaps.org namespace, but some have none.
+    ns = root.tag[:root.tag.index("}") + 1] if root.tag.startswith("{") else ""
+    if root.tag == f"{ns}sitemapindex":
+        entry = "sitemap"
+    elif root.tag == f"{ns}urlset":
+        entry = "url"
+    else:
+        return [], []
+    locs = [
+        loc.text.strip() for loc in root.findall(f"{ns}{entry}/{ns}loc")
+        if loc.text]
+    if entry == "sitemap":
+        return [], locs
+    return locs, []
+
+
+class SitemapReader(Thread):
+    '''
+    Seeds the frontier from the sitemaps of every host queued with
+    add_host. Runs on its own thread so no download happens inside
+    Frontier.add_url. Hosts are remembered next to the save file for
+    config.robots_ttl seconds, so a resume doesn't read them again.
+    '''
+    def __init__(self, frontier, reset):
+        self.frontier = frontier
+        self.config = frontier.config
+        self.logger = frontier.logger
+        self.robots = frontier.robots
+        self.hosts = Queue()
+        # netloc -> time its sitemaps were read
+        self.done = shelve.open(
+            f"{self.config.save_file}.sitemaps", flag="n" if reset else "c")
+        # Guards self.done between this thread and close.
+        self.lock = Lock()
+        super().__init__(daemon=True)
+
+    def add_host(self, url):
+        self.hosts.put(url)
+
+    def run(self):
+        while True:
+            url = self.hosts.get()
+            try:
+                self._ingest(url)
+            except Exception as e:
+                self.logger.error(f"Failed reading sitemaps for {url}: {e}")
+            finally:
+                self.frontier.finish_url()
+
+    def _allowed(self, url):
+        # Sitemaps only need the domain check, is_valid would reject the
+        # .xml.gz ones by extension.
+        return is_valid_domain(url) and self.robots.can_fetch(url)
+
+    def _ingest(self, url):
+        netloc = urlparse(url).netloc
+        with self.lock:
+            read_at = self.done.get(netloc)
+        if read_at is not None and time.time() - read_at < self.config.robots_ttl:
+            return
+        if self.robots.retry_at(url) is not None:
+            # robots.txt failed, try again the next time the host is seen.
+            with self.frontier.lock:
+                self.frontier.sitemap_hosts.discard(netloc)
+            return
+        sitemaps = [
+            (sitemap, 0) for sitemap in self.robots.sitemaps(url)
+            if self._allowed(sitemap)]
+        added = 0
+        while sitemaps:
+            sitemap, depth = sitemaps.pop()
+            self.frontier.wait_for_host(sitemap)
+            resp = self.config.concurrency.fetch(sitemap, self.logger)
+            if resp.status != 200 or resp.raw_response is None:
+                continue
+            try:
+                urls, nested = parse_sitemap(resp.raw_response.content)
+            except Exception as e:
+                self.logger.info(f"Could not parse sitemap {sitemap}: {e}")
+                continue
+            if depth < SITEMAP_MAX_DEPTH:
+                sitemaps.extend(
+                    (nested_map, depth + 1) for nested_map in nested
+                    if self._allowed(nested_map))
+            for sitemap_url in urls:
+                if is_valid(sitemap_url) and self.frontier.add_url(sitemap_url):
+                    added += 1
+        with self.lock:
+            self.done[netloc] = time.time()
+            self.done.sync()
+        if added:
+            self.logger.info(f"Added {added} urls from sitemaps of {netloc}.")
+
+    def close(self):
+        with self.lock:
+            self.done.close()
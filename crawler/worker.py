@@ -1,26 +1,36 @@
-from threading import Thread
+from threading import Thread, Lock
 
 from inspect import getsource
-from utils.download import download
-from utils import get_logger
+from utils import get_logger, get_urlhash
 import scraper
-import time
-from .sim import exact_hash, shingles, similarity
+from .sim import exact_hash, shingles, sketch
 
 # near similarity threshold 
 SIMILARITY_THRESHOLD = 0.9
 
+# the scraper source only has to be checked once per process, not per worker
+_scraper_checked = False
+_scraper_check_lock = Lock()
+
+def check_scraper_imports():
+    global _scraper_checked
+    with _scraper_check_lock:
+        if _scraper_checked:
+            return
+        source = getsource(scraper)
+        assert {source.find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
+        assert {source.find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
+        _scraper_checked = True
+
 class Worker(Thread):
     def __init__(self, worker_id, config, frontier):
         self.logger = get_logger(f"Worker-{worker_id}", "Worker")
         self.config = config
         self.frontier = frontier
-        # add hash and shingles for similarity detection
-        self.hashes = set()
-        self.shingles = {}
+        # hashes and sketches for similarity detection are shared through the frontier
+        self.fingerprints = frontier.fingerprints
         # basic check for requests in scraper
-        assert {getsource(scraper).find(req) for req in {"from requests import", "import requests"}} == {-1}, "Do not use requests in scraper.py"
-        assert {getsource(scraper).find(req) for req in {"from urllib.request import", "import urllib.request"}} == {-1}, "Do not use urllib.request in scraper.py"
+        check_scraper_imports()
         super().__init__(daemon=True)
         
     def run(self):
@@ -29,58 +39,73 @@ class Worker(Thread):
             if not tbd_url:
                 self.logger.info("Frontier is empty. Stopping Crawler.")
                 break
-            resp = download(tbd_url, self.config, self.logger)
-
-            # skip invalid response
-            if resp is None or resp.status >= 400 or resp.raw_response is None:
-                self.logger.warning(f"Invalid or empty response for {tbd_url}")
-                self.frontier.mark_url_complete(tbd_url)
-                continue
-
-            # detection here
             try:
-                content = resp.raw_response.content.decode("utf-8", errors="ignore")
-            except Exception:
-                content = str(resp.raw_response.content)
+                self._crawl(tbd_url)
+            finally:
+                self.frontier.finish_url()
+
+    def _crawl(self, tbd_url):
+        retry_at = self.frontier.robots.retry_at(tbd_url)
+        if retry_at is not None:
+            # robots.txt is unavailable, not a reason to drop the url
+            self.frontier.retry_url(tbd_url, retry_at)
+            return
+        if not self.frontier.robots.can_fetch(tbd_url):
+            self.logger.info(f"Disallowed by robots.txt: {tbd_url}")
+            self.frontier.mark_url_complete(tbd_url)
+            return
+        self.frontier.wait_for_host(tbd_url)
+        try:
+            resp = self.config.concurrency.fetch(tbd_url, self.logger)
+        except Exception as e:
+            # left incomplete so it is retried on resume
+            self.logger.error(f"Failed downloading {tbd_url}: {e}")
+            return
 
-            # skip very small pages
-            if len(content) < 100:
-                self.frontier.mark_url_complete(tbd_url)
-                continue
+        # skip invalid response
+        if resp is None or resp.status >= 400 or resp.raw_response is None:
+            self.logger.warning(f"Invalid or empty response for {tbd_url}")
+            self.frontier.mark_url_complete(tbd_url)
+            return
 
-            page_hashes = exact_hash(content)
-            if page_hashes in self.hashes:
-                self.logger.info(f"[Duplicate] Skipping exact duplicate: {tbd_url}")
-                self.frontier.mark_url_complete(tbd_url)
-                continue
-            self.hashes.add(page_hashes)
-            page_shingles = shingles(content)
-            # check near similarity here
-            is_near_duplicate = False
-            for other_url, other_shingles in self.shingles.items():
-                # compute similarity and compare with threshold
-                # if nearly similar, complete
-                sim = similarity(page_shingles, other_shingles)
-                if sim >= SIMILARITY_THRESHOLD:
-                    self.logger.info(f"[Near-duplicate] {tbd_url} ≈ {other_url} (similarity={sim:.2f})")
-                    is_near_duplicate = True
-                    break
-    
-            if is_near_duplicate:
-                self.frontier.mark_url_complete(tbd_url)
-                continue
+        # detection here
+        try:
+            content = resp.raw_response.content.decode("utf-8", errors="ignore")
+        except Exception:
+            content = str(resp.raw_response.content)
 
-            # Store shingles for this page
-            self.shingles[tbd_url] = page_shingles
+        # skip very small pages
+        if len(content) < 100:
+            self.frontier.mark_url_complete(tbd_url)
+            return
 
-            # end detection
-            
-            
-            self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            scraped_urls = scraper.scraper(tbd_url, resp)
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
+        # fingerprints carry the page's urlhash so a refetch after a crash
+        # does not match its own fingerprint
+        urlhash = get_urlhash(tbd_url)
+        page_hash = bytes.fromhex(exact_hash(content))
+        other_urlhash = self.fingerprints.add_hash(page_hash, bytes.fromhex(urlhash))
+        if other_urlhash is not None:
+            other_url = self.frontier.get_url(other_urlhash.hex())
+            self.logger.info(f"[Duplicate] Skipping exact duplicate: {tbd_url} = {other_url}")
+            self.frontier.mark_url_complete(tbd_url)
+            return
+        page_sketch = sketch(shingles(content))
+        # check near similarity here, the sketch is stored if it is not a near duplicate
+        match = self.fingerprints.add_sketch(page_sketch, bytes.fromhex(urlhash), SIMILARITY_THRESHOLD)
+        if match is not None:
+            sim, other_urlhash = match
+            other_url = self.frontier.get_url(other_urlhash.hex())
+            self.logger.info(f"[Near-duplicate] {tbd_url} ≈ {other_url} (similarity={sim:.2f})")
             self.frontier.mark_url_complete(tbd_url)
-            time.sleep(self.config.time_delay)
+            return
+
+        # end detection
+        
+        
+        self.logger.info(
+            f"Downloaded {tbd_url}, status <{resp.status}>, "
+            f"using cache {self.config.cache_server}.")
+        scraped_urls = scraper.scraper(tbd_url, resp)
+        for scraped_url in scraped_urls:
+            self.frontier.add_url(scraped_url)
+        self.frontier.mark_url_complete(tbd_url)
@@ -1,19 +1,37 @@
+import time
+_import_start = time.perf_counter()
+
 from configparser import ConfigParser
 from argparse import ArgumentParser
 
 from utils.server_registration import get_cache_server
 from utils.config import Config
+from utils import get_logger
 from crawler import Crawler
 
 import storage
 
+_import_time = time.perf_counter() - _import_start
+
 def main(config_file, restart):
+    logger = get_logger("STARTUP")
+    logger.info(f"Imports took {_import_time * 1000:.1f} ms.")
+    start = time.perf_counter()
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
     config.cache_server = get_cache_server(config, restart)
+    registered = time.perf_counter()
     crawler = Crawler(config, restart)
-    crawler.start()
+    ready = time.perf_counter()
+    logger.info(
+        f"Startup took {(ready - start) * 1000:.1f} ms "
+        f"(cache server registration {(registered - start) * 1000:.1f} ms, "
+        f"frontier load {(ready - registered) * 1000:.1f} ms).")
+    try:
+        crawler.start()
+    finally:
+        crawler.close()
 
 
 if __name__ == "__main__":
@@ -23,7 +41,7 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     try:
-        storage.open_shelves()
+        # Shelves are opened on first use by the scraper.
         main(args.config_file, args.restart)
     finally:
         storage.close_shelves()
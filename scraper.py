@@ -8,13 +8,16 @@ import tldextract
 import storage
 from utils import get_logger
 
-storage.open_shelves()
+# Shelves are opened lazily by storage on first use; only make sure they
+# get flushed on exit.
 atexit.register(storage.close_shelves)
 
-stats_shelf = storage.get_stats_shelf()
-words_shelf = storage.get_words_shelf()
 logger = get_logger("SCRAPER")
 
+# Use the suffix list bundled with tldextract instead of downloading it,
+# so subdomain lookups never touch the network.
+tld_extract = tldextract.TLDExtract(suffix_list_urls=())
+
 LOW_INFO_THRESHOLD = 50
 STOP_WORDS = {
     "a", "about", "above", "after", "again", "against", "all", "am", "an", "and", "any",
@@ -72,7 +75,9 @@ def scraper(url, resp):
     filtered_tokens = [t for t in all_tokens if t not in STOP_WORDS]
 
     # 5. Update page count safely
-    stats_shelf["page_count"] += 1
+    with storage.get_shelves_lock():
+        stats_shelf = storage.get_stats_shelf()
+        stats_shelf["page_count"] += 1
 
     # 6. Detect low-information pages
     if is_low_info(filtered_tokens):
@@ -104,26 +109,31 @@ def is_low_info(tokens):
 def analyze(url, filtered_tokens, all_tokens):
     """Updates shelves with page stats: longest page, subdomains, common words."""
     n = len(all_tokens)
-
-    # Longest page
-    longest_page = stats_shelf["longest_page"]
-    if n > longest_page["count"]:
-        longest_page["url"] = url
-        longest_page["count"] = n
-        stats_shelf["longest_page"] = longest_page
-
-    # Subdomains
-    subdomain = tldextract.extract(url).subdomain or "root"
-    subdomains = stats_shelf["subdomains"]
-    subdomains[subdomain] = subdomains.get(subdomain, 0) + 1
-    stats_shelf["subdomains"] = subdomains
-
-    # Common words
+    subdomain = tld_extract(url).subdomain or "root"
     word_counts = {}
     for word in filtered_tokens:
         word_counts[word] = word_counts.get(word, 0) + 1
-    for word, count in word_counts.items():
-        words_shelf[word] = words_shelf.get(word, 0) + count
+
+    # Workers scrape concurrently, the shelves are updated under one lock
+    with storage.get_shelves_lock():
+        stats_shelf = storage.get_stats_shelf()
+        words_shelf = storage.get_words_shelf()
+
+        # Longest page
+        longest_page = stats_shelf["longest_page"]
+        if n > longest_page["count"]:
+            longest_page["url"] = url
+            longest_page["count"] = n
+            stats_shelf["longest_page"] = longest_page
+
+        # Subdomains
+        subdomains = stats_shelf["subdomains"]
+        subdomains[subdomain] = subdomains.get(subdomain, 0) + 1
+        stats_shelf["subdomains"] = subdomains
+
+        # Common words
+        for word, count in word_counts.items():
+            words_shelf[word] = words_shelf.get(word, 0) + count
 
 
 def extract_next_links(url, soup: BeautifulSoup):
@@ -164,25 +174,31 @@ def extract_next_links(url, soup: BeautifulSoup):
     return list(next_links)
 
 
+def is_valid_domain(url):
+    """Determines if a URL is http(s) within the allowed domains, without the page filters."""
+    parsed = urlparse(url)
+    if parsed.scheme not in {"http", "https"}:
+        return False
+
+    # Check domain restriction
+    domain = parsed.netloc.lower()
+    valid_domains = [
+        "ics.uci.edu",
+        "cs.uci.edu",
+        "informatics.uci.edu",
+        "stat.uci.edu",
+    ]
+    return any(domain.endswith(d) for d in valid_domains)
+
+
 def is_valid(url):
     """Determines if a URL should be crawled."""
     # Trap here
     # https://wiki.ics.uci.edu/doku.php/projects:maint-winter-2019?tab_details=history&do=media&tab_files=files&image=security%3Avpn_settings5.png&ns=virtual_environments, status <200>, using cache ('styx.ics.uci.edu', 9001).
     try:
-        parsed = urlparse(url)
-        if parsed.scheme not in {"http", "https"}:
-            return False
-
-        # Check domain restriction
-        domain = parsed.netloc.lower()
-        valid_domains = [
-            "ics.uci.edu",
-            "cs.uci.edu",
-            "informatics.uci.edu",
-            "stat.uci.edu",
-        ]
-        if not any(domain.endswith(d) for d in valid_domains):
+        if not is_valid_domain(url):
             return False
+        parsed = urlparse(url)
 
         # Reject overly long URLs (potential traps)
         if len(url) > 200:
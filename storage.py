@@ -1,34 +1,48 @@
 import shelve
+from threading import RLock
 
 _stats_shelf = None
 _words_shelf = None
+# Held around every read-modify-write of the shelves, workers scrape
+# concurrently and shelve is not thread safe.
+_shelves_lock = RLock()
 
 def open_shelves():
     global _stats_shelf, _words_shelf
 
-    if _stats_shelf is None:
-        _stats_shelf = shelve.open("crawler_stats.db")
-        if 'longest_page' not in _stats_shelf:
-            _stats_shelf['longest_page'] = {'url': 'None', 'count': 0}
-        if 'subdomains' not in _stats_shelf:
-            _stats_shelf['subdomains'] = {}
-        if 'page_count' not in _stats_shelf:
-            _stats_shelf['page_count'] = 0
+    with _shelves_lock:
+        if _stats_shelf is None:
+            _stats_shelf = shelve.open("crawler_stats.db")
+            if 'longest_page' not in _stats_shelf:
+                _stats_shelf['longest_page'] = {'url': 'None', 'count': 0}
+            if 'subdomains' not in _stats_shelf:
+                _stats_shelf['subdomains'] = {}
+            if 'page_count' not in _stats_shelf:
+                _stats_shelf['page_count'] = 0
 
-    if _words_shelf is None:
-         _words_shelf = shelve.open("crawler_words.db")
+        if _words_shelf is None:
+             _words_shelf = shelve.open("crawler_words.db")
 
 def close_shelves():
     global _stats_shelf, _words_shelf
-    if _stats_shelf is not None:
-        _stats_shelf.close()
-        _stats_shelf = None
-    if _words_shelf is not None:
-        _words_shelf.close()
-        _words_shelf = None
+    with _shelves_lock:
+        if _stats_shelf is not None:
+            _stats_shelf.close()
+            _stats_shelf = None
+        if _words_shelf is not None:
+            _words_shelf.close()
+            _words_shelf = None
 
+# Shelves are opened on first use so importing scraper stays cheap.
 def get_stats_shelf():
+    if _stats_shelf is None:
+        open_shelves()
     return _stats_shelf
 
 def get_words_shelf():
-    return _words_shelf
\ No newline at end of file
+    if _words_shelf is None:
+        open_shelves()
+    return _words_shelf
+
+def get_shelves_lock():
+    return _shelves_lock
@@ -8,6 +8,10 @@ class Config(object):
         assert self.user_agent != "DEFAULT AGENT", "Set useragent in config.ini"
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
+        # Bounds for the adaptive concurrency limit, both default to THREADCOUNT.
+        self.min_threads_count = int(config["LOCAL PROPERTIES"].get("MINTHREADCOUNT", self.threads_count))
+        self.max_threads_count = int(config["LOCAL PROPERTIES"].get("MAXTHREADCOUNT", self.threads_count))
+        assert 1 <= self.min_threads_count <= self.threads_count <= self.max_threads_count, "Need 1 <= MINTHREADCOUNT <= THREADCOUNT <= MAXTHREADCOUNT"
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
 
         self.host = config["CONNECTION"]["HOST"]
@@ -15,5 +19,8 @@ class Config(object):
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        self.robots_ttl = float(config["CRAWLER"].get("ROBOTSTTL", "86400"))
+        self.target_latency = float(config["CRAWLER"].get("TARGETLATENCY", "2"))
 
-        self.cache_server = None
\ No newline at end of file
+        self.cache_server = None
+        self.concurrency = None
\ No newline at end of file